@@ -3,21 +3,19 @@
 # Copyright (C) 2024 Armored Turtle
 #
 # This file may be distributed under the terms of the GNU GPLv3 license.
-import traceback
-
 from configparser import Error as error
 
-try: from extras.AFC_utils import ERROR_STR
-except: raise error("Error when trying to import AFC_utils.ERROR_STR\n{trace}".format(trace=traceback.format_exc()))
-
-try: from extras.AFC_lane import AFCLaneState
-except: raise error(ERROR_STR.format(import_lib="AFC_lane", trace=traceback.format_exc()))
+try: from extras.AFC_utils import ERROR_STR, add_filament_switch
+except:
+    import traceback
+    raise error("Error when trying to import AFC_utils\n{trace}".format(trace=traceback.format_exc()))
 
-try: from extras.AFC_BoxTurtle import afcBoxTurtle
-except: raise error(ERROR_STR.format(import_lib="AFC_BoxTurtle", trace=traceback.format_exc()))
-
-try: from extras.AFC_utils import add_filament_switch
-except: raise error(ERROR_STR.format(import_lib="AFC_utils", trace=traceback.format_exc()))
+try:
+    from extras.AFC_lane import AFCLaneState
+    from extras.AFC_BoxTurtle import afcBoxTurtle
+except Exception as e:
+    import traceback
+    raise error(ERROR_STR.format(import_lib=getattr(e, "name", None) or "AFC_lane/AFC_BoxTurtle", trace=traceback.format_exc()))
 
 class AFC_ACE(afcBoxTurtle):
     """
@@ -37,6 +35,13 @@ class AFC_ACE(afcBoxTurtle):
     POSITION_LOAD = 1      # Load position - filament engaged with drive gear for feeding
     POSITION_UNLOAD = 2    # Unload position - filament engaged for retraction to spool
 
+    # Offset of each position from LOAD, in multiples of steps_per_position
+    _POS_OFFSET = {POSITION_LOAD: 0, POSITION_FREE: 1, POSITION_UNLOAD: 2}
+
+    # Homing step sizes in mm, coarse moves find the endstop then fine moves refine its edge
+    HOME_COARSE_STEP = 5.0
+    HOME_FINE_STEP = 0.5
+
     def __init__(self, config):
         super().__init__(config)
         self.type                   = config.get('type', 'ACE')
@@ -47,6 +52,9 @@ class AFC_ACE(afcBoxTurtle):
         self.current_selected_lane  = None
         self.current_position       = None  # Current selector position (FREE, LOAD, or UNLOAD)
         self.home_state             = False
+        self._toolhead              = None
+        self._led_objs              = {}                                                                            # Cached Klipper LED objects keyed by lane index
+        self._lanes_by_index        = {}                                                                            # Lane objects keyed by lane index
 
         # Selector configuration
         self.lane1_offset           = config.getfloat("lane1_offset", 1.5)                                         # Offset from home to Lane 1 LOAD position (mm)
@@ -56,6 +64,13 @@ class AFC_ACE(afcBoxTurtle):
         self.selector_speed         = config.getfloat("selector_speed", 50)                                         # Selector movement speed in mm/s
         self.selector_accel         = config.getfloat("selector_accel", 50)                                         # Selector acceleration in mm/s^2
 
+        self._pos_offset            = {position: offset * self.steps_per_position for position, offset in self._POS_OFFSET.items()}
+
+        # Selector movement only depends on config values, so precompute distances for every lane/position
+        self._movement_table        = {(lane_index, position): self._compute_selector_movement(lane_index, position)
+                                       for lane_index in range(1, 5)
+                                       for position in (self.POSITION_FREE, self.POSITION_LOAD, self.POSITION_UNLOAD)}
+
         # LED configuration (individual LEDs, not Neopixel)
         self.led_pins               = {}                                                                            # Dictionary to store LED pins for each lane
 
@@ -69,16 +84,25 @@ class AFC_ACE(afcBoxTurtle):
         self.failed_to_home         = False
 
         # Register home pin button
-        buttons = self.printer.load_object(config, "buttons")
-        buttons.register_buttons([self.home_pin], self.home_callback)
-
-        if self.home_pin is not None:
-            self.home_sensor = add_filament_switch(f"{self.name}_home_pin", self.home_pin, self.printer, self.enable_sensors_in_gui)
+        self.buttons = self.printer.load_object(config, "buttons")
+        self.home_sensor = self._register_sensor(self.home_pin, self.home_callback, f"{self.name}_home_pin")
 
         # Register common tension sensor if defined
         if self.tension_common_pin is not None:
-            buttons.register_buttons([self.tension_common_pin], self.tension_common_callback)
-            self.tension_common_sensor = add_filament_switch(f"{self.name}_tension_common", self.tension_common_pin, self.printer, self.enable_sensors_in_gui)
+            self.tension_common_sensor = self._register_sensor(self.tension_common_pin, self.tension_common_callback,
+                                                               f"{self.name}_tension_common")
+
+    def _register_sensor(self, pin, callback, name):
+        """
+        Registers button callback for pin and adds pin as filament switch sensor so it shows up in web guis
+
+        :param pin: Pin to register
+        :param callback: Function to call when pin is triggered/untriggered
+        :param name: Name to give filament switch sensor
+        :return: filament_switch_sensor object
+        """
+        self.buttons.register_buttons([pin], callback)
+        return add_filament_switch(name, pin, self.printer, self.enable_sensors_in_gui)
 
     def handle_connect(self):
         """
@@ -87,19 +111,8 @@ class AFC_ACE(afcBoxTurtle):
         and assigns objects for drive and selector steppers.
         """
 
-        try:
-            self.drive_stepper_obj = self.printer.lookup_object('AFC_stepper {}'.format(self.drive_stepper))
-        except:
-            error_string = 'Error: No config found for drive_stepper: {drive_stepper} in [AFC_ACE {stepper}]. Please make sure [AFC_stepper {drive_stepper}] section exists in your config'.format(
-                drive_stepper=self.drive_stepper, stepper=self.name)
-            raise error(error_string)
-
-        try:
-            self.selector_stepper_obj = self.printer.lookup_object('AFC_stepper {}'.format(self.selector_stepper))
-        except:
-            error_string = 'Error: No config found for selector_stepper: {selector_stepper} in [AFC_ACE {stepper}]. Please make sure [AFC_stepper {selector_stepper}] section exists in your config'.format(
-                selector_stepper=self.selector_stepper, stepper=self.name)
-            raise error(error_string)
+        self.drive_stepper_obj = self._require_stepper('drive_stepper', self.drive_stepper)
+        self.selector_stepper_obj = self._require_stepper('selector_stepper', self.selector_stepper)
 
         # Register custom commands
         self.gcode.register_mux_command('HOME_UNIT', "UNIT", self.name, self.cmd_HOME_UNIT)
@@ -107,10 +120,52 @@ class AFC_ACE(afcBoxTurtle):
         self.gcode.register_mux_command('ACE_PRECISE_POSITION', "UNIT", self.name, self.cmd_ACE_PRECISE_POSITION)
 
         super().handle_connect()
+        self._refresh_lane_index()
+
+        # Cache toolhead and per lane LED objects so LED updates don't need lookups
+        self._toolhead = self.printer.lookup_object('toolhead')
+        for lane_index in range(1, 5):
+            try:
+                self._led_objs[lane_index] = self.printer.lookup_object(f'led LED_lane{lane_index}')
+            except Exception as e:
+                self._led_objs[lane_index] = None
+                self.logger.debug(f"Could not control LED for lane {lane_index}: {e}")
 
         self.logo = '<span class=success--text>ACE Ready\n</span>'
         self.logo_error = '<span class=error--text>ACE Not Ready</span>\n'
 
+    def _require_stepper(self, attr, name):
+        """
+        Looks up AFC_stepper object, raises config error if section does not exist
+
+        :param attr: Config option name that references the stepper, used in error message
+        :param name: Name of AFC_stepper section to lookup
+        :return: AFC_stepper object
+        """
+        try:
+            return self.printer.lookup_object(f'AFC_stepper {name}')
+        except:
+            raise error(f'Error: No config found for {attr}: {name} in [AFC_ACE {self.name}]. Please make sure [AFC_stepper {name}] section exists in your config')
+
+    def _refresh_lane_index(self):
+        """
+        Rebuilds lane index lookup table, call again if lanes are added after connect
+        """
+        self._lanes_by_index = {lane.index: lane for lane in self.lanes.values()}
+
+    def _get_lane_by_index(self, lane_num):
+        """
+        Returns lane object for lane number, refreshing the lookup table once if lane is not found
+
+        :param lane_num: Lane index (1-4)
+        :return: Lane object or None if lane does not exist in this unit
+        """
+        lane = self._lanes_by_index.get(lane_num)
+        if lane is None and len(self._lanes_by_index) != len(self.lanes):
+            self._refresh_lane_index()
+            lane = self._lanes_by_index.get(lane_num)
+        return lane
+
     def system_Test(self, cur_lane, delay, assignTcmd, enable_movement):
         """
         Test system readiness before operations
@@ -170,12 +225,7 @@ class AFC_ACE(afcBoxTurtle):
         lane_num = gcmd.get_int('LANE', minval=1, maxval=4)
         position = gcmd.get_int('POSITION', minval=0, maxval=2)
 
-        # Find lane object
-        lane = None
-        for l in self.lanes.values():
-            if l.index == lane_num:
-                lane = l
-                break
+        lane = self._get_lane_by_index(lane_num)
 
         if lane is None:
             gcmd.respond_info(f"Lane {lane_num} not found")
@@ -204,12 +254,7 @@ class AFC_ACE(afcBoxTurtle):
         lane_num = gcmd.get_int('LANE', minval=1, maxval=4)
         buffer_distance = gcmd.get_float('BUFFER', default=20.0, minval=5.0, maxval=100.0)
 
-        # Find lane object
-        lane = None
-        for l in self.lanes.values():
-            if l.index == lane_num:
-                lane = l
-                break
+        lane = self._get_lane_by_index(lane_num)
 
         if lane is None:
             gcmd.respond_info(f"Lane {lane_num} not found")
@@ -230,6 +275,11 @@ class AFC_ACE(afcBoxTurtle):
         :param prep: Set to True if this function is being called within prep function
         :return boolean: Returns True if homing was successful
         """
+        # Selector is already sitting at home, no need to move
+        if self.home_state and self.current_selected_lane is None and self.current_position is None and not prep:
+            self.prep_homed = True
+            return True
+
         total_moved = 0
 
         # If we know current position, do a fast move back first
@@ -237,13 +287,19 @@ class AFC_ACE(afcBoxTurtle):
             estimated_distance = self.calculate_selector_movement(self.current_selected_lane.index, self.POSITION_FREE)
             self.selector_stepper_obj.move(estimated_distance * -1, self.selector_speed, self.selector_accel, False)
 
-        # Then do slow moves until home sensor triggers
-        while not self.home_state and not self.failed_to_home:
-            self.selector_stepper_obj.move(-1, 20, 20, False)
-            total_moved += 1
-            if total_moved > (self.steps_per_lane * 4 + self.steps_per_position * 2):
-                self.failed_to_home = True
-                self.afc.error.AFC_error("Failed to home {}".format(self.name), False)
+        # Then do coarse moves until home sensor triggers
+        max_travel = self.steps_per_lane * 4 + self.steps_per_position * 2
+        if not self.home_state and not self.failed_to_home:
+            total_moved = self._slow_home_moves(self.HOME_COARSE_STEP, total_moved, max_travel)
+            if total_moved is None:
+                return False
+
+            # Back off and do fine moves to find the edge of the home sensor
+            self.selector_stepper_obj.move(self.HOME_COARSE_STEP, 20, 20, False)
+            self.afc.reactor.pause(self.afc.reactor.monotonic() + 0.02)
+            total_moved = self._slow_home_moves(self.HOME_FINE_STEP, total_moved - self.HOME_COARSE_STEP,
+                                                max_travel + self.HOME_COARSE_STEP)
+            if total_moved is None:
                 return False
 
         self.prep_homed = True
@@ -252,9 +308,9 @@ class AFC_ACE(afcBoxTurtle):
         self.current_position = None
         return True
 
-    def calculate_selector_movement(self, lane_index, position):
+    def _compute_selector_movement(self, lane_index, position):
         """
-        Calculates movement in mm to reach specified lane and position
+        Computes movement in mm from home to reach specified lane and position
 
         Position calculation based on measured values:
         - HOME (0mm) is the endstop position
@@ -276,17 +332,44 @@ class AFC_ACE(afcBoxTurtle):
         # LOAD = base position (0mm offset)
         # FREE = +5mm from LOAD
         # UNLOAD = +10mm from LOAD
-        if position == self.POSITION_LOAD:
-            position_offset = 0
-        elif position == self.POSITION_FREE:
-            position_offset = self.steps_per_position  # +5mm
-        elif position == self.POSITION_UNLOAD:
-            position_offset = self.steps_per_position * 2  # +10mm
-        else:
-            position_offset = 0
+        position_offset = self._pos_offset.get(position, 0)
+
+        return base_position + lane_offset + position_offset
+
+    def _slow_home_moves(self, step, total_moved, max_travel):
+        """
+        Moves selector towards home in `step` mm increments until home sensor triggers
 
-        total_movement = base_position + lane_offset + position_offset
-        self.logger.debug(f"ACE: Selector movement to lane {lane_index} position {position}: {total_movement}mm (base={base_position}, lane_offset={lane_offset}, pos_offset={position_offset})")
+        :param step: Distance in mm to move between home sensor checks
+        :param total_moved: Distance in mm already moved towards home
+        :param max_travel: Failsafe distance in mm after which homing fails
+        :return float: Returns total distance moved, or None if homing failed
+        """
+        while not self.home_state and not self.failed_to_home:
+            self.selector_stepper_obj.move(-step, 20, 20, False)
+            # Give button callback time to update home state before checking again
+            self.afc.reactor.pause(self.afc.reactor.monotonic() + 0.02)
+            total_moved += step
+            if total_moved > max_travel:
+                self.failed_to_home = True
+                self.afc.error.AFC_error("Failed to home {}".format(self.name), False)
+                return None
+        return total_moved
+
+    def calculate_selector_movement(self, lane_index, position):
+        """
+        Returns movement in mm to reach specified lane and position, distances are
+        precomputed at init since they only depend on config values
+
+        :param lane_index: Lane index (1-4)
+        :param position: Target position (FREE=0, LOAD=1, UNLOAD=2)
+        :return float: Return movement in mm to move selector
+        """
+        total_movement = self._movement_table.get((lane_index, position))
+        if total_movement is None:
+            total_movement = self._compute_selector_movement(lane_index, position)
+
+        self.logger.debug(f"ACE: Selector movement to lane {lane_index} position {position}: {total_movement}mm (base={self.lane1_offset}, lane_offset={(lane_index - 1) * self.steps_per_lane}, pos_offset={self._pos_offset.get(position, 0)})")
         return total_movement
 
     def move_to_position(self, lane, position):
@@ -299,6 +382,10 @@ class AFC_ACE(afcBoxTurtle):
         """
         self.failed_to_home = False
 
+        # Selector is already at requested lane and position
+        if self.current_selected_lane is lane and self.current_position == position:
+            return True
+
         # Always home first if we're not sure of position
         if self.current_selected_lane != lane or self.current_position is None:
             self.logger.debug(f"ACE: {self.name} Homing to endstop.")
@@ -602,18 +689,14 @@ class AFC_ACE(afcBoxTurtle):
         :param state: True for on, False for off
         :param brightness: LED brightness level (0.0-1.0)
         """
+        led_obj = self._led_objs.get(lane_index)
+        if led_obj is None:
+            return
+
         # Use Klipper's LED control for individual white LEDs
         try:
-            led_name = f'led LED_lane{lane_index}'
-            led_obj = self.printer.lookup_object(led_name)
-            if state:
-                # Turn on LED with specified brightness
-                led_obj.set_color(self.printer.lookup_object('toolhead').get_last_move_time(),
-                                 red=0.0, green=0.0, blue=0.0, white=brightness)
-            else:
-                # Turn off LED
-                led_obj.set_color(self.printer.lookup_object('toolhead').get_last_move_time(),
-                                 red=0.0, green=0.0, blue=0.0, white=0.0)
+            led_obj.set_color(self._toolhead.get_last_move_time(),
+                              red=0.0, green=0.0, blue=0.0, white=brightness if state else 0.0)
         except Exception as e:
             self.logger.debug(f"Could not control LED for lane {lane_index}: {e}")
 
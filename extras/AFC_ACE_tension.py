@@ -4,11 +4,12 @@
 #
 # This file may be distributed under the terms of the GNU GPLv3 license.
 
-import traceback
 from configparser import Error as error
 
 try: from extras.AFC_utils import add_filament_switch
-except: raise error("Error when trying to import AFC_utils.add_filament_switch\n{trace}".format(trace=traceback.format_exc()))
+except:
+    import traceback
+    raise error("Error when trying to import AFC_utils.add_filament_switch\n{trace}".format(trace=traceback.format_exc()))
 
 class AFC_ACE_TensionAssist:
     """
@@ -69,6 +70,11 @@ class AFC_ACE_TensionAssist:
         self.enable     = False
         self.current_lane = None
 
+        # Cached unit capabilities, bound in set_current_lane
+        self._unit_obj      = None
+        self._set_sel       = None
+        self._drive_move    = None
+
         # Lane name - will be set when lane references this buffer
         self.lane_name  = config.get("lane", None)
 
@@ -94,6 +100,11 @@ class AFC_ACE_TensionAssist:
         self.last_assist_time = 0
         self.min_assist_interval = 0.5  # Minimum seconds between assist moves
 
+        # Set when printer is ready, tension assist is enabled and in active mode so
+        # tension_callback can skip remaining checks with a single test
+        self._printer_ready = False
+        self._assist_armed  = False
+
         # Register tension sensor
         self.tension_filament_switch_name = "{}_tension".format(self.name)
         self.tension_switch = add_filament_switch(
@@ -108,6 +119,7 @@ class AFC_ACE_TensionAssist:
 
         # Register G-code commands
         self.printer.register_event_handler("klippy:ready", self._handle_ready)
+        self.printer.register_event_handler("klippy:shutdown", self._handle_shutdown)
         self.function = self.printer.load_object(config, 'AFC_functions')
 
         self.gcode.register_mux_command("ENABLE_TENSION_ASSIST",  "TENSION", self.name, self.cmd_ENABLE_TENSION_ASSIST)
@@ -137,26 +149,26 @@ class AFC_ACE_TensionAssist:
         """
         self.tension_state = state
 
+        # Nothing to do when tension returned to normal or assist is not armed
+        if not state or not self._assist_armed:
+            return
+
         # Check if common tension sensor is triggered (max tension protection)
-        if hasattr(self.current_lane, 'unit_obj') and hasattr(self.current_lane.unit_obj, 'tension_common_state'):
-            if self.current_lane.unit_obj.tension_common_state:
-                # TENSION_COMMON is triggered = maximum tension reached
-                # Do NOT feed more filament - safety protection
-                if self.debug:
-                    self.logger.warning("{} max tension detected (TENSION_COMMON), skipping assist".format(self.name))
-                return
+        if getattr(self._unit_obj, 'tension_common_state', False):
+            # TENSION_COMMON is triggered = maximum tension reached
+            # Do NOT feed more filament - safety protection
+            if self.debug:
+                self.logger.warning("{} max tension detected (TENSION_COMMON), skipping assist".format(self.name))
+            return
 
-        # Only respond in active mode when printer is ready and printing
-        if (self.assist_mode == "active" and
-            self.enable and
-            self.printer.state_message == 'Printer is ready' and
+        # Only respond while printing
+        if (not self.afc.in_toolchange and
             self.afc.function.is_printing() and
-            not self.afc.function.is_paused() and
-            not self.afc.in_toolchange):
+            not self.afc.function.is_paused()):
 
             # Check minimum interval between assists
             current_time = self.reactor.monotonic()
-            if state and (current_time - self.last_assist_time) >= self.min_assist_interval:
+            if (current_time - self.last_assist_time) >= self.min_assist_interval:
                 self.do_tension_assist()
                 self.last_assist_time = current_time
 
@@ -172,12 +184,9 @@ class AFC_ACE_TensionAssist:
             return
 
         try:
-            # Get the ACE unit object to access Drive motor
-            unit_obj = self.current_lane.unit_obj
-
             # Move Drive motor forward to feed filament
-            if hasattr(unit_obj, 'drive_stepper_obj') and unit_obj.drive_stepper_obj is not None:
-                unit_obj.drive_stepper_obj.move(
+            if self._drive_move is not None:
+                self._drive_move(
                     self.tension_feed_length,
                     self.tension_feed_speed,
                     self.tension_feed_accel,
@@ -193,9 +202,23 @@ class AFC_ACE_TensionAssist:
         except Exception as e:
             self.logger.error("{} error during tension assist: {}".format(self.name, str(e)))
 
+    def _update_assist_armed(self):
+        """
+        Recomputes armed flag used by tension_callback, needs to be called whenever
+        printer ready state, enable or assist_mode changes
+        """
+        self._assist_armed = self._printer_ready and self.enable and self.assist_mode == "active"
+
+    def _handle_shutdown(self):
+        """Handle klippy shutdown event - disarm tension assist"""
+        self._printer_ready = False
+        self._update_assist_armed()
+
     def _handle_ready(self):
         """Handle klippy ready event - find and store reference to our lane"""
         self.min_event_systime = self.reactor.monotonic() + 2.
+        self._printer_ready = True
+        self._update_assist_armed()
 
         # Find the lane that references this buffer
         if self.lane_name:
@@ -215,6 +238,7 @@ class AFC_ACE_TensionAssist:
         try to find it from AFC current lane.
         """
         self.enable = True
+        self._update_assist_armed()
 
         # Try to get current lane if not set
         if self.current_lane is None:
@@ -223,7 +247,7 @@ class AFC_ACE_TensionAssist:
                 if current_lane_name:
                     lane_obj = self.afc.lanes.get(current_lane_name)
                     if lane_obj and lane_obj.buffer_obj == self:
-                        self.current_lane = lane_obj
+                        self.set_current_lane(lane_obj)
             except:
                 pass
 
@@ -232,18 +256,18 @@ class AFC_ACE_TensionAssist:
             return
 
         # Set selector position based on mode
-        unit_obj = self.current_lane.unit_obj
+        unit_obj = self._unit_obj
 
         if self.assist_mode == "active":
             # Active mode: keep selector in LOAD position
-            if hasattr(unit_obj, 'set_selector_position'):
-                unit_obj.set_selector_position(self.current_lane, unit_obj.POSITION_LOAD)
+            if self._set_sel is not None:
+                self._set_sel(self.current_lane, unit_obj.POSITION_LOAD)
             self.logger.debug("{} enabled in ACTIVE mode (selector in LOAD)".format(self.name))
 
         else:  # passive mode
             # Passive mode: move selector to FREE position
-            if hasattr(unit_obj, 'set_selector_position'):
-                unit_obj.set_selector_position(self.current_lane, unit_obj.POSITION_FREE)
+            if self._set_sel is not None:
+                self._set_sel(self.current_lane, unit_obj.POSITION_FREE)
             self.logger.debug("{} enabled in PASSIVE mode (selector in FREE)".format(self.name))
 
     def disable_buffer(self):
@@ -251,6 +275,7 @@ class AFC_ACE_TensionAssist:
         Disable tension assist. Called when lane is unloaded from toolhead.
         """
         self.enable = False
+        self._update_assist_armed()
         self.logger.debug("{} tension assist disabled".format(self.name))
 
     def set_current_lane(self, lane):
@@ -261,6 +286,18 @@ class AFC_ACE_TensionAssist:
         self.current_lane = lane
         if lane is not None:
             self.lanes[lane.name] = lane
+        self._bind_unit(getattr(lane, 'unit_obj', None))
+
+    def _bind_unit(self, unit_obj):
+        """
+        Caches unit object and the unit functions used by tension assist so
+        they don't have to be looked up on every sensor callback.
+
+        :param unit_obj: Unit object of current lane, or None if no lane is set
+        """
+        self._unit_obj   = unit_obj
+        self._set_sel    = getattr(unit_obj, 'set_selector_position', None)
+        self._drive_move = getattr(getattr(unit_obj, 'drive_stepper_obj', None), 'move', None)
 
     def buffer_status(self):
         """
@@ -311,19 +348,17 @@ class AFC_ACE_TensionAssist:
 
         old_mode = self.assist_mode
         self.assist_mode = mode
+        self._update_assist_armed()
 
         self.logger.info("{} tension assist mode changed from {} to {}".format(
             self.name, old_mode, mode))
 
         # If currently enabled, update selector position
-        if self.enable and self.current_lane is not None:
-            unit_obj = self.current_lane.unit_obj
+        if self.enable and self.current_lane is not None and self._set_sel is not None:
             if self.assist_mode == "active":
-                if hasattr(unit_obj, 'set_selector_position'):
-                    unit_obj.set_selector_position(self.current_lane, unit_obj.POSITION_LOAD)
+                self._set_sel(self.current_lane, self._unit_obj.POSITION_LOAD)
             else:
-                if hasattr(unit_obj, 'set_selector_position'):
-                    unit_obj.set_selector_position(self.current_lane, unit_obj.POSITION_FREE)
+                self._set_sel(self.current_lane, self._unit_obj.POSITION_FREE)
 
     def cmd_QUERY_TENSION(self, gcmd):
         """